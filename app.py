@@ -1,6 +1,24 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import importlib.util
+import io
+import itertools
 import os
+import queue
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config import MAX_FILE_SIZE
+from llm_breaker import breaker
 
 # Page configuration
 st.set_page_config(
@@ -10,205 +28,117 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Try to import Plotly with fallback
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
-    PLOTLY_AVAILABLE = True
-except ImportError:
-    PLOTLY_AVAILABLE = False
-
-# Custom CSS for modern dark theme styling
-st.markdown("""
-<style>
-    /* Main background styling */
-    .main {
-        background: linear-gradient(135deg, #0f0f23 0%, #1a1a2e 50%, #16213e 100%);
-        color: #ffffff;
-    }
-    
-    /* Sidebar background */
-    .css-1d391kg, .css-1lcbmhc {
-        background: linear-gradient(180deg, #1e1e2e 0%, #2d2d44 100%);
-    }
-    
-    /* Main styling */
-    .main-header {
-        font-size: 4rem;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        text-align: center;
-        margin-bottom: 1rem;
-        font-weight: 800;
-    }
-    
-    .sub-header {
-        font-size: 1.8rem;
-        color: #a8d8ea;
-        margin-bottom: 2rem;
-        text-align: center;
-        font-weight: 600;
-    }
-    
-    /* Card styling */
-    .feature-card {
-        background: rgba(255, 255, 255, 0.1);
-        backdrop-filter: blur(10px);
-        padding: 25px;
-        border-radius: 15px;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        margin: 15px 0;
-        transition: transform 0.3s ease;
-        color: #ffffff;
-    }
-    
-    .feature-card:hover {
-        transform: translateY(-5px);
-        background: rgba(255, 255, 255, 0.15);
-    }
-    
-    .info-card {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 25px;
-        border-radius: 15px;
-        margin: 15px 0;
-        border: 1px solid rgba(255, 255, 255, 0.3);
-    }
-    
-    .success-card {
-        background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
-        color: white;
-        padding: 20px;
-        border-radius: 15px;
-        margin: 10px 0;
-        border: 1px solid rgba(255, 255, 255, 0.3);
-    }
-    
-    .metric-card {
-        background: rgba(255, 255, 255, 0.1);
-        backdrop-filter: blur(10px);
-        padding: 20px;
-        border-radius: 12px;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        text-align: center;
-        color: #ffffff;
-    }
-    
-    /* Button styling */
-    .stButton button {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 12px 30px;
-        border-radius: 8px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(102, 126, 234, 0.4);
-        background: linear-gradient(135deg, #764ba2 0%, #667eea 100%);
-    }
-    
-    /* Text input styling */
-    .stTextInput input, .stTextArea textarea {
-        background: rgba(255, 255, 255, 0.1);
-        border: 1px solid rgba(255, 255, 255, 0.3);
-        color: #ffffff;
-        border-radius: 10px;
-    }
-    
-    .stTextInput input:focus, .stTextArea textarea:focus {
-        border-color: #667eea;
-        box-shadow: 0 0 0 2px rgba(102, 126, 234, 0.2);
-    }
-    
-    /* File uploader styling */
-    .stFileUploader {
-        background: rgba(255, 255, 255, 0.1) !important;
-        border: 2px dashed rgba(102, 126, 234, 0.5) !important;
-        border-radius: 10px;
-        padding: 20px;
-        color: #ffffff;
-    }
-    
-    /* Selectbox styling */
-    .stSelectbox div div {
-        background: rgba(255, 255, 255, 0.1);
-        color: #ffffff;
-    }
-    
-    /* Dataframe styling */
-    .dataframe {
-        background: rgba(255, 255, 255, 0.1) !important;
-        color: #ffffff !important;
-    }
-    
-    /* Tab styling */
-    .stTabs [data-baseweb="tab-list"] {
-        background: rgba(255, 255, 255, 0.1);
-        border-radius: 10px;
-        padding: 10px;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        background: transparent;
-        color: #ffffff;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
-        color: white !important;
-    }
-    
-    /* Warning and info boxes */
-    .stAlert {
-        background: rgba(255, 255, 255, 0.1);
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        color: #ffffff;
-    }
-    
-    /* Sidebar text color */
-    .css-1d391kg, .css-1lcbmhc {
-        color: #ffffff !important;
-    }
-    
-    /* Make all text in sidebar readable */
-    .css-1d391kg p, .css-1lcbmhc p, .css-1d391kg label, .css-1lcbmhc label {
-        color: #ffffff !important;
-    }
-    
-    /* Make file uploader text readable */
-    .stFileUploader label {
-        color: #ffffff !important;
-    }
-    
-    /* Make metric values stand out */
-    .metric-card h2 {
-        color: #667eea !important;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.3);
-    }
-    
-    /* Make headers stand out */
-    h1, h2, h3, h4, h5, h6 {
-        color: #a8d8ea !important;
-    }
-    
-    /* Make regular text readable */
-    p, div, span {
-        color: #e6e6e6 !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Check for Plotly without importing it; plotly is only loaded once a chart is built
+PLOTLY_AVAILABLE = importlib.util.find_spec("plotly") is not None
+# Likewise for PandasAI, whose import pulls in a large dependency tree
+PANDASAI_AVAILABLE = importlib.util.find_spec("pandasai") is not None
+
+# Uploads above this size are previewed first and fully loaded in the background
+LARGE_FILE_BYTES = 100 * 1024 * 1024
+PREVIEW_ROWS = 50_000
+
+# Uploads above config.MAX_FILE_SIZE are never parsed in full, only sampled on request
+MAX_FILE_BYTES = MAX_FILE_SIZE * 1024 * 1024
+SAMPLE_ROWS = 500_000
+
+# CSVs above this size are parsed in chunks to keep peak memory down
+CHUNKED_CSV_BYTES = 50 * 1024 * 1024
+CSV_CHUNK_ROWS = 2**18
+# Bytes each of pyarrow's CSV reader threads parses at a time
+CSV_BLOCK_BYTES = 8 << 20
+
+# Canned questions for the Quick Analysis panel
+QUICK_ACTIONS = [
+    ("📊 Basic Stats", "Show basic statistics for every numeric column"),
+    ("ℹ️ Data Info", "List each column with its data type and number of missing values"),
+    ("🏆 Top Values", "Show the 5 most frequent values of each categorical column"),
+]
+
+# Quick charts plot at most this many sampled points; histograms bin every row instead
+VIZ_SAMPLE_ROWS = 5000
+HISTOGRAM_BINS = 30
+# Beyond these the auto-picked first columns are rarely what the user wants to see
+VIZ_MAX_COLUMNS = 50
+VIZ_MAX_ROWS = 1_000_000
+
+# Views of the Data Overview section
+OVERVIEW_TABS = ["📊 Data Preview", "🔍 Column Info", "📈 Quick Stats"]
+
+# Sample rows shown to the LLM with the schema
+PROMPT_SAMPLE_ROWS = 5
+# PandasAI saves each chart answer here as <prompt id>.png
+CHARTS_DIR = os.path.join(tempfile.gettempdir(), "datasense-charts")
+
+# PandasAI returns failures as a message starting with this text instead of raising
+PANDASAI_FAILURE_PREFIX = "Unfortunately, I was not able to"
+
+# Custom CSS for modern dark theme styling, served from static/ so browsers cache it;
+# the content hash in the URL makes them fetch it again whenever the file changes
+CSS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "datasense.css")
+with open(CSS_FILE, "rb") as css_file:
+    CSS_VERSION = hashlib.md5(css_file.read()).hexdigest()[:8]
+CUSTOM_CSS = f'<style>@import url("app/static/datasense.css?v={CSS_VERSION}");</style>'
+
+# Static sidebar and welcome-screen content, built once at import instead of on every rerun
+EXAMPLE_QUESTIONS_HTML = """
+<div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px; border-left: 4px solid #667eea;">
+<b style="color: #a8d8ea;">📈 For Sales Data:</b><br>
+<span style="color: #e6e6e6;">• "Show monthly sales trends"</span><br>
+<span style="color: #e6e6e6;">• "Top 5 products by revenue"</span><br>
+<span style="color: #e6e6e6;">• "Sales by region pie chart"</span><br><br>
+
+<b style="color: #a8d8ea;">👥 For HR Data:</b><br>
+<span style="color: #e6e6e6;">• "Average salary by department"</span><br>
+<span style="color: #e6e6e6;">• "Employee age distribution"</span><br>
+<span style="color: #e6e6e6;">• "Department headcount bar chart"</span><br><br>
+
+<b style="color: #a8d8ea;">🔧 General Analysis:</b><br>
+<span style="color: #e6e6e6;">• "Show basic statistics"</span><br>
+<span style="color: #e6e6e6;">• "Find missing values"</span><br>
+<span style="color: #e6e6e6;">• "Correlation heatmap"</span>
+</div>
+"""
+
+FEATURES = [
+    ("📊", "Smart Data Profiling", "Automatic data quality assessment"),
+    ("🤖", "AI-Powered Analysis", "Natural language queries"),
+    ("📈", "Auto Visualizations", "Instant charts and graphs"),
+    ("⚡", "Real-time Processing", "Fast analysis results")
+]
+# One element for the whole list instead of one st.markdown call per feature
+FEATURES_HTML = "".join(
+    f'''<div style="margin: 10px 0; padding: 10px; background: rgba(255,255,255,0.1); border-radius: 8px;">
+<strong style="color: #a8d8ea;">{emoji} {title}</strong><br>
+<small style="color: #e6e6e6;">{desc}</small>
+</div>'''
+    for emoji, title, desc in FEATURES
+)
+
+SAMPLE_SALES = pd.DataFrame({
+    'Date': ['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-02', '2024-01-03'],
+    'Product': ['Laptop', 'Mouse', 'Laptop', 'Keyboard', 'Monitor'],
+    'Sales': [15000, 8000, 16000, 4500, 22000],
+    'Region': ['North', 'South', 'North', 'East', 'West'],
+    'Units': [15, 80, 16, 45, 22]
+})
+SAMPLE_EMPLOYEES = pd.DataFrame({
+    'Name': ['John Smith', 'Sarah Johnson', 'Mike Brown', 'Emily Davis', 'David Wilson'],
+    'Department': ['Engineering', 'Marketing', 'Engineering', 'Sales', 'HR'],
+    'Salary': [85000, 65000, 95000, 75000, 60000],
+    'Age': [32, 28, 35, 29, 41],
+    'Experience': [5, 3, 8, 4, 12]
+})
 
 def get_openai_api_key():
-    """Retrieves API key from Streamlit secrets or sidebar input."""
+    """Retrieves API key from Streamlit secrets, the environment or sidebar input."""
     if "OPENAI_API_KEY" in st.secrets:
         return st.secrets["OPENAI_API_KEY"]
     
+    # Read lazily so the app imports cleanly in CI and picks up keys set after start-up
+    env_api_key = os.environ.get("OPENAI_API_KEY", "")
+    if env_api_key:
+        return env_api_key
+    
     with st.sidebar:
         st.markdown("### 🔑 API Configuration")
         api_key = st.text_input(
@@ -221,95 +151,453 @@ def get_openai_api_key():
             st.success("✅ API Key configured!")
         return api_key
 
-def load_data(uploaded_file):
-    """Load data from uploaded CSV or Excel file"""
+def _read_csv_arrow(data):
+    """Parse a CSV on pyarrow's multithreaded reader into Arrow-backed columns"""
+    table = pacsv.read_csv(
+        pa.BufferReader(data),
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_BYTES),
+        # Match pandas: empty text cells are missing values, not empty strings
+        convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+    )
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+def _read_csv_chunked(data):
+    """Read a big CSV a chunk at a time into Arrow-backed columns, concatenating once"""
+    chunks = pd.read_csv(
+        io.BytesIO(data),
+        chunksize=CSV_CHUNK_ROWS,
+        low_memory=True,
+        dtype_backend="pyarrow"
+    )
+    # Arrow-backed chunks concatenate as chunked arrays, without copying the buffers
+    return pd.concat(chunks, ignore_index=True, copy=False)
+
+def _excel_cell(value):
+    """Map a calamine cell value to what pandas' Excel reader would give"""
+    if value == "":
+        return None
+    # Date-only cells would otherwise leave the whole column as object
+    if type(value) is datetime.date:
+        return pd.Timestamp(value)
+    return value
+
+def _excel_header(header):
+    """Column names from a header row, named and deduplicated the way read_excel does it"""
+    names = []
+    for i, name in enumerate(header):
+        if name == "":
+            name = f"Unnamed: {i}"
+        elif isinstance(name, float) and name.is_integer():
+            name = int(name)  # a header cell of 2021 comes back from calamine as 2021.0
+        names.append(name)
+    # Repeats become "val.1", "val.2", ..., skipping names used anywhere in the header
+    taken = set(names)
+    counts = {}
+    for i, base in enumerate(names):
+        name, count = base, counts.get(base, 0)
+        while count > 0:
+            counts[base] = count + 1
+            name = f"{base}.{count}"
+            count = count + 1 if name in taken else counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+@contextlib.contextmanager
+def _calamine_panics():
+    """Report python-calamine's Rust panics, which only derive from BaseException, as errors"""
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file)
+        yield
+    except Exception:
+        raise
+    except BaseException as e:
+        if type(e).__name__ != "PanicException":
+            raise
+        raise ValueError(f"Could not read the workbook: {e}") from None
+
+def _read_excel_rows(data, nrows=None, sheet=None):
+    """Stream one sheet's rows (the first by default) with python-calamine into a DataFrame"""
+    from python_calamine import CalamineWorkbook
+    with _calamine_panics():
+        workbook = CalamineWorkbook.from_filelike(io.BytesIO(data))
+        if sheet is None:
+            worksheet = workbook.get_sheet_by_index(0)
+        else:
+            worksheet = workbook.get_sheet_by_name(sheet)
+        # iter_rows panics on a sheet without cells; read_excel gives an empty frame
+        if worksheet.height == 0:
+            return pd.DataFrame()
+        rows = worksheet.iter_rows()
+        header = next(rows, [])
+        if nrows is not None:
+            rows = itertools.islice(rows, nrows)
+        # Calamine reports blank cells as "", where pandas' Excel reader would give NaN
+        records = ([_excel_cell(value) for value in row] for row in rows)
+        df = pd.DataFrame.from_records(records, columns=_excel_header(header))
+    return df.convert_dtypes(dtype_backend="pyarrow")
+
+def _excel_sheet_names(data):
+    """Sheet names of a workbook, read without parsing any cells"""
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        return pd.ExcelFile(io.BytesIO(data)).sheet_names
+    with _calamine_panics():
+        return CalamineWorkbook.from_filelike(io.BytesIO(data)).sheet_names
+
+def _read_upload(data, name, nrows=None, sheet=None):
+    """Parse raw CSV or Excel bytes into a DataFrame, optionally only the first rows"""
+    if name.endswith('.csv'):
+        if nrows is None:
+            try:
+                if len(data) > CHUNKED_CSV_BYTES:
+                    return _read_csv_chunked(data)
+                return _read_csv_arrow(data)
+            except Exception:
+                pass  # Fall back to the C parser for files the Arrow reader rejects
+        # The Arrow reader has no nrows option, so previews also use the C parser
+        return pd.read_csv(io.BytesIO(data), nrows=nrows, dtype_backend="pyarrow")
+    try:
+        return _read_excel_rows(data, nrows, sheet)
+    except ImportError:
+        # Without python-calamine, let pandas pick its default engine (openpyxl for .xlsx)
+        return pd.read_excel(io.BytesIO(data), sheet_name=sheet or 0, nrows=nrows, dtype_backend="pyarrow")
+
+def _optimize_dtypes(df):
+    """Downcast numeric columns and store low-cardinality text as categories"""
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    for col in df.select_dtypes(include='floating').columns:
+        df[col] = pd.to_numeric(df[col], downcast='float')
+    if len(df) > 0:
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            # All-blank columns (null[pyarrow]) have no values to make categories from
+            unique = df[col].nunique()
+            if 0 < unique and unique / len(df) < 0.5:
+                df[col] = df[col].astype('category')
+    return df
+
+def _prepare_frame(data, name, nrows=None, sheet=None):
+    """Parse and shrink an uploaded file"""
+    df = _read_upload(data, name, nrows, sheet)
+    df.attrs["raw_memory_mb"] = estimate_memory_mb(df)
+    return _optimize_dtypes(df)
+
+@st.cache_data(ttl="1h", max_entries=4, show_spinner=False)
+def _load_cached(data, name, nrows=None, sheet=None):
+    """Parse and shrink an uploaded file, once per distinct file content"""
+    return _prepare_frame(data, name, nrows, sheet)
+
+def _background_loader():
+    """This session's worker for full loads of large uploads, so no session queues behind another"""
+    if "full_loader" not in st.session_state:
+        st.session_state.full_loader = ThreadPoolExecutor(max_workers=1)
+    return st.session_state.full_loader
+
+@st.fragment(run_every=2)
+def _watch_full_load(future):
+    """Rerun the app once the background full load has finished"""
+    if future.done():
+        st.rerun()
+
+def _load_large(uploaded_file, sheet=None):
+    """Preview a large upload while it fully loads in the background; returns (df, is_complete)"""
+    load_id = (uploaded_file.file_id, sheet)
+    if st.session_state.get("full_load_id") != load_id:
+        # Parsed once and kept: the watcher's reruns would otherwise re-hash the whole file
+        data = uploaded_file.getvalue()
+        preview = _prepare_frame(data, uploaded_file.name, nrows=PREVIEW_ROWS, sheet=sheet)
+        if "full_load" in st.session_state:
+            st.session_state.full_load.cancel()  # the replaced upload or sheet, if not started yet
+        st.session_state.full_load = _background_loader().submit(
+            _prepare_frame, data, uploaded_file.name, sheet=sheet
+        )
+        st.session_state.full_load_id = load_id
+        st.session_state.full_load_preview = preview
+    
+    future = st.session_state.full_load
+    if future.done():
+        st.session_state.pop("full_load_preview", None)
+        return future.result(), True
+    
+    st.info(f"📄 Previewing the first {PREVIEW_ROWS:,} rows of ~{uploaded_file.size / 1e6:.0f} MB; the full file is still loading.")
+    _watch_full_load(future)
+    return st.session_state.full_load_preview, False
+
+def choose_excel_sheet(uploaded_file):
+    """Sheet picker for multi-sheet workbooks; None means the first (or only) sheet"""
+    if not uploaded_file.name.endswith(('.xlsx', '.xls')):
+        return None
+    if st.session_state.get("sheet_names_id") != uploaded_file.file_id:
+        try:
+            names = _excel_sheet_names(uploaded_file.getvalue())
+        except Exception:
+            names = []  # load_data reports the unreadable file
+        st.session_state.sheet_names = names
+        st.session_state.sheet_names_id = uploaded_file.file_id
+    
+    names = st.session_state.sheet_names
+    if len(names) <= 1:
+        return None
+    return st.selectbox("📑 Sheet", names, help="Only the selected sheet is loaded")
+
+def load_data(uploaded_file, sheet=None):
+    """Load data from uploaded CSV or Excel file, parsing each upload only once per session"""
+    try:
+        if uploaded_file.name.endswith(('.csv', '.xlsx', '.xls')):
+            # Refuse to parse oversized files in full before anything is read
+            oversized = uploaded_file.size > MAX_FILE_BYTES
+            if oversized:
+                st.warning(f"⚠️ This file is ~{uploaded_file.size / 1e6:.0f} MB, above the {MAX_FILE_SIZE} MB limit for a full load.")
+                # Keyed on the upload, so each new file starts unticked
+                if not st.checkbox(f"Analyze a {SAMPLE_ROWS:,}-row sample", key=f"analyze_sample_{uploaded_file.file_id}"):
+                    st.session_state.pop("data_id", None)
+                    st.session_state.pop("data_df", None)
+                    return None
+            
+            # Every rerun hands back a new UploadedFile for the same upload; skip re-reading it
+            data_id = (uploaded_file.file_id, sheet)
+            if st.session_state.get("data_id") == data_id:
+                return st.session_state.data_df
+            
+            if oversized:
+                df = _load_cached(uploaded_file.getvalue(), uploaded_file.name, nrows=SAMPLE_ROWS, sheet=sheet)
+            elif uploaded_file.size > LARGE_FILE_BYTES:
+                df, complete = _load_large(uploaded_file, sheet)
+                if not complete:
+                    return df
+            else:
+                df = _load_cached(uploaded_file.getvalue(), uploaded_file.name, sheet=sheet)
         else:
             st.error("Unsupported file format. Please upload CSV or Excel files.")
             return None
+        st.session_state.data_id = data_id
+        st.session_state.data_df = df
         return df
     except Exception as e:
         st.error(f"Error loading file: {str(e)}")
         return None
 
-def display_data_overview(df):
+def estimate_memory_mb(df, sample_size=10_000):
+    """Estimate memory usage: exact for numeric/Arrow columns, sampled for Python strings"""
+    shallow = df.memory_usage(index=True, deep=False)
+    is_object = (df.dtypes == object).to_numpy()
+    total = shallow.iloc[0] + shallow.iloc[1:][~is_object].sum()
+    if is_object.any() and len(df) > 0:
+        strings = df.iloc[:, is_object]
+        if len(strings) > sample_size:
+            strings = strings.sample(sample_size, random_state=0)
+        total += strings.memory_usage(index=False, deep=True).sum() / len(strings) * len(df)
+    return total / 1024**2
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def split_columns(df_hash, _df):
+    """Numeric and categorical column names, worked out once per dataset"""
+    # All-blank columns (null[pyarrow] from the Arrow readers) have nothing to chart or describe
+    numeric = [c for c in _df.select_dtypes(include=['number']).columns if _df[c].notna().any()]
+    categorical = [
+        c for c in _df.select_dtypes(include=['object', 'string', 'category']).columns
+        if _df[c].notna().any()
+    ]
+    return numeric, categorical
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _heavy_overview(df_hash, _df):
+    """Full-scan column statistics, computed once per dataset"""
+    # One boolean matrix reduced in NumPy; plain arrays also skip pandas' index alignment
+    nulls = _df.isna().to_numpy().sum(axis=0)
+    col_info = pd.DataFrame({
+        'Column': _df.columns.to_numpy(),
+        'Data Type': _df.dtypes.astype(str).to_numpy(),
+        'Non-Null': len(_df) - nulls,
+        'Null': nulls,
+        'Unique': _df.nunique().to_numpy()
+    }, copy=False)
+    has_numeric = len(split_columns(df_hash, _df)[0]) > 0
+    return {
+        "col_info": col_info,
+        "null_count": int(nulls.sum()),
+        "describe": _df.describe() if has_numeric else None
+    }
+
+def _arrow_table(frame):
+    """Arrow table for st.dataframe; mixed-type object columns are shown as text"""
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    # Same fallback st.dataframe applies to columns Arrow cannot type; categories can mix types too
+    text = {}
+    for col in frame.select_dtypes(include=['object', 'category']).columns:
+        try:
+            pa.array(frame[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            text[col] = str
+    return pa.Table.from_pandas(frame.astype(text), preserve_index=False)
+
+def get_overview_stats(df, df_hash):
+    """Overview artefacts for the current upload, rebuilt only when the dataset changes"""
+    if st.session_state.get("overview_fp") != df_hash:
+        stats = dict(_heavy_overview(df_hash, df))
+        stats["memory_mb"] = estimate_memory_mb(df)
+        # Convert once so reruns hand st.dataframe Arrow tables without a pandas round-trip
+        stats["col_info"] = _arrow_table(stats["col_info"])
+        stats["preview"] = _arrow_table(df.iloc[:10])
+        st.session_state.overview_stats = stats
+        st.session_state.overview_fp = df_hash
+    return st.session_state.overview_stats
+
+def display_data_overview(df, df_hash):
     """Display enhanced information about the dataset"""
     st.markdown("### 📋 Data Overview")
     
+    stats = get_overview_stats(df, df_hash)
+    
     # Metrics in columns
     col1, col2, col3, col4 = st.columns(4)
     
-    with col1:
-        st.markdown(f'''
-        <div class="metric-card">
-            <h3>📊</h3>
-            <h2 style="margin: 10px 0;">{df.shape[0]:,}</h2>
-            <p>Total Rows</p>
-        </div>
-        ''', unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f'''
-        <div class="metric-card">
-            <h3>🔢</h3>
-            <h2 style="margin: 10px 0;">{df.shape[1]}</h2>
-            <p>Total Columns</p>
-        </div>
-        ''', unsafe_allow_html=True)
+    col1.metric("📊 Total Rows", f"{df.shape[0]:,}")
+    col2.metric("🔢 Total Columns", df.shape[1])
     
-    with col3:
-        memory_usage = df.memory_usage(deep=True).sum() / 1024**2
-        st.markdown(f'''
-        <div class="metric-card">
-            <h3>💾</h3>
-            <h2 style="margin: 10px 0;">{memory_usage:.2f}</h2>
-            <p>Memory (MB)</p>
-        </div>
-        ''', unsafe_allow_html=True)
+    memory_usage = stats["memory_mb"]
+    raw_memory_usage = df.attrs.get("raw_memory_mb", memory_usage)
+    col3.metric(
+        "💾 Memory (MB)",
+        f"{memory_usage:.2f}",
+        delta=f"{memory_usage - raw_memory_usage:.2f} MB vs. unoptimized",
+        delta_color="inverse",
+        help=f"{raw_memory_usage:.2f} MB before optimization"
+    )
     
-    with col4:
-        null_count = df.isnull().sum().sum()
-        st.markdown(f'''
-        <div class="metric-card">
-            <h3>⚠️</h3>
-            <h2 style="margin: 10px 0;">{null_count}</h2>
-            <p>Missing Values</p>
-        </div>
-        ''', unsafe_allow_html=True)
+    col4.metric("⚠️ Missing Values", f"{stats['null_count']:,}")
     
-    # Data preview with tabs
-    tab1, tab2, tab3 = st.tabs(["📊 Data Preview", "🔍 Column Info", "📈 Quick Stats"])
+    overview_tabs(stats)
+
+@st.fragment
+def overview_tabs(stats):
+    """Preview / column info / stats switcher that only renders, and reruns, the chosen view"""
+    tab = st.radio(
+        "Overview view",
+        OVERVIEW_TABS,
+        key="overview_tab",
+        horizontal=True,
+        label_visibility="collapsed"
+    )
     
-    with tab1:
+    if tab == OVERVIEW_TABS[0]:
         st.write("**First 10 rows of your data:**")
-        st.dataframe(df.head(10), use_container_width=True, height=400)
-    
-    with tab2:
+        st.dataframe(stats["preview"], use_container_width=True, height=400, hide_index=True)
+    elif tab == OVERVIEW_TABS[1]:
         st.write("**Column Information:**")
-        col_info = pd.DataFrame({
-            'Column': df.columns,
-            'Data Type': df.dtypes,
-            'Non-Null': df.count(),
-            'Null': df.isnull().sum(),
-            'Unique': [df[col].nunique() for col in df.columns]
-        })
-        st.dataframe(col_info, use_container_width=True)
-    
-    with tab3:
+        st.dataframe(stats["col_info"], use_container_width=True, hide_index=True)
+    else:
         st.write("**Basic Statistics:**")
-        if df.select_dtypes(include=['number']).shape[1] > 0:
-            st.dataframe(df.describe(), use_container_width=True)
+        if stats["describe"] is not None:
+            st.dataframe(stats["describe"], use_container_width=True)
         else:
             st.info("No numerical columns found for statistical summary.")
 
-def create_quick_visualizations(df):
-    """Create automatic visualizations for the data"""
+def _viz_frame(df, n=VIZ_SAMPLE_ROWS):
+    """Random sample of at most n rows for charts that draw every point"""
+    return df if len(df) <= n else df.sample(n, random_state=0)
+
+def _box_stats(df, cat_col, num_col):
+    """Per-category quartiles and 1.5 IQR whisker ends, computed over every row"""
+    data = df[[cat_col, num_col]].dropna()
+    groups = data[cat_col]
+    values = data[num_col].astype('float64')
+    quartiles = values.groupby(groups, observed=True).quantile([0.25, 0.5, 0.75]).unstack()
+    q1, median, q3 = quartiles[0.25], quartiles[0.5], quartiles[0.75]
+    # Whiskers end at the furthest points still inside the fences, as Plotly draws them
+    low = groups.map(q1 - 1.5 * (q3 - q1)).astype('float64')
+    high = groups.map(q3 + 1.5 * (q3 - q1)).astype('float64')
+    inside = (values >= low) & (values <= high)
+    whiskers = values[inside].groupby(groups[inside], observed=True).agg(['min', 'max'])
+    return pd.DataFrame({
+        'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': whiskers['min'], 'upperfence': whiskers['max']
+    })
+
+# Transparent dark styling shared by the quick charts
+CHART_LAYOUT = dict(
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font_color='white'
+)
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def histogram_figure(df_hash, col, _df):
+    """Distribution of one numeric column, binned in NumPy over every row"""
+    import plotly.graph_objects as go
+    values = _df[col].to_numpy(dtype='float64', na_value=np.nan)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=HISTOGRAM_BINS)
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        marker_color='#667eea'
+    ))
+    fig.update_layout(
+        title=f"Distribution of {col}",
+        xaxis_title=str(col),
+        yaxis_title="count",
+        bargap=0,
+        **CHART_LAYOUT
+    )
+    return fig
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def scatter_figure(df_hash, x_col, y_col, _df):
+    """WebGL scatter of two numeric columns over a row sample"""
+    import plotly.graph_objects as go
+    sample = _viz_frame(_df)
+    fig = go.Figure(go.Scattergl(
+        x=sample[x_col].to_numpy(dtype='float64', na_value=np.nan),
+        y=sample[y_col].to_numpy(dtype='float64', na_value=np.nan),
+        mode='markers',
+        marker_color='#764ba2'
+    ))
+    fig.update_layout(
+        title=f"{x_col} vs {y_col}",
+        xaxis_title=str(x_col),
+        yaxis_title=str(y_col),
+        **CHART_LAYOUT
+    )
+    return fig
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def box_figure(df_hash, cat_col, num_col, _df):
+    """Box plot per category, drawn from precomputed statistics"""
+    import plotly.graph_objects as go
+    # Hand Plotly the box statistics so the browser doesn't aggregate raw rows
+    stats = _box_stats(_df, cat_col, num_col)
+    fig = go.Figure(go.Box(
+        x=stats.index.astype(str),
+        q1=stats['q1'], median=stats['median'], q3=stats['q3'],
+        lowerfence=stats['lowerfence'], upperfence=stats['upperfence'],
+        marker_color='#f093fb'
+    ))
+    fig.update_layout(
+        title=f"{num_col} by {cat_col}",
+        xaxis_title=str(cat_col),
+        yaxis_title=str(num_col),
+        **CHART_LAYOUT
+    )
+    return fig
+
+@st.fragment
+def create_quick_visualizations(df, df_hash, numeric_cols, categorical_cols):
+    """Create automatic visualizations for the data; the toggle reruns only this section"""
     st.markdown("### 🎯 Quick Visualizations")
     
+    if df.shape[1] > VIZ_MAX_COLUMNS or len(df) > VIZ_MAX_ROWS:
+        st.info(f"📐 Quick visualizations are skipped for datasets over {VIZ_MAX_COLUMNS} columns or {VIZ_MAX_ROWS:,} rows.")
+        return
+    
+    # Switched off, no figure is built or sent to the browser
+    if not st.toggle("Show quick visualizations", value=True, key="show_quick_viz"):
+        return
+    
     if not PLOTLY_AVAILABLE:
         st.warning("""
         **Plotly not available** - Install plotly for enhanced visualizations:
@@ -318,64 +606,37 @@ def create_quick_visualizations(df):
         ```
         For now, using basic Streamlit charts...
         """)
-        create_basic_visualizations(df)
+        create_basic_visualizations(df, numeric_cols, categorical_cols)
         return
     
-    numeric_cols = df.select_dtypes(include=['number']).columns
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns
-    
+    # (placeholder, figure builder, column arguments, chart name) in page order
+    charts = []
     if len(numeric_cols) > 0:
         col1, col2 = st.columns(2)
-        
-        with col1:
-            if len(numeric_cols) >= 1:
-                try:
-                    fig = px.histogram(df, x=numeric_cols[0], 
-                                     title=f"Distribution of {numeric_cols[0]}",
-                                     color_discrete_sequence=['#667eea'])
-                    fig.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='white'
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                except Exception as e:
-                    st.error(f"Could not create histogram: {str(e)}")
-        
-        with col2:
-            if len(numeric_cols) >= 2:
-                try:
-                    fig = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1],
-                                   title=f"{numeric_cols[0]} vs {numeric_cols[1]}",
-                                   color_discrete_sequence=['#764ba2'])
-                    fig.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='white'
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                except Exception as e:
-                    st.error(f"Could not create scatter plot: {str(e)}")
-    
+        charts.append((col1.empty(), histogram_figure, (numeric_cols[0],), "histogram"))
+        if len(numeric_cols) >= 2:
+            charts.append((col2.empty(), scatter_figure, (numeric_cols[0], numeric_cols[1]), "scatter plot"))
     if len(categorical_cols) > 0 and len(numeric_cols) > 0:
-        try:
-            fig = px.box(df, x=categorical_cols[0], y=numeric_cols[0],
-                       title=f"{numeric_cols[0]} by {categorical_cols[0]}",
-                       color_discrete_sequence=['#f093fb'])
-            fig.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='white'
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        except Exception as e:
-            st.error(f"Could not create box plot: {str(e)}")
+        charts.append((st.empty(), box_figure, (categorical_cols[0], numeric_cols[0]), "box plot"))
+    if not charts:
+        return
+    
+    # Build the figures side by side and draw each one as soon as it is ready
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(len(charts), initializer=add_script_run_ctx, initargs=(None, ctx)) as pool:
+        futures = {
+            pool.submit(build, df_hash, *columns, df): (slot, name)
+            for slot, build, columns, name in charts
+        }
+        for future in as_completed(futures):
+            slot, name = futures[future]
+            try:
+                slot.plotly_chart(future.result(), use_container_width=True)
+            except Exception as e:
+                slot.error(f"Could not create {name}: {str(e)}")
 
-def create_basic_visualizations(df):
+def create_basic_visualizations(df, numeric_cols, categorical_cols):
     """Fallback visualizations using Streamlit's built-in charts"""
-    numeric_cols = df.select_dtypes(include=['number']).columns
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns
-    
     if len(numeric_cols) > 0:
         col1, col2 = st.columns(2)
         
@@ -394,22 +655,298 @@ def create_basic_visualizations(df):
         summary = df.groupby(categorical_cols[0])[numeric_cols[0]].mean()
         st.bar_chart(summary)
 
-def analyze_with_pandasai(df, question, api_key):
+def get_df_hash(df, uploaded_file, sheet=None):
+    """Fingerprint the dataset once per upload and keep it in session state"""
+    # Row count tells a large file's preview apart from its full load
+    upload_key = (uploaded_file.file_id, uploaded_file.name, uploaded_file.size, sheet, len(df))
+    if st.session_state.get("df_hash_key") != upload_key:
+        row_hashes = pd.util.hash_pandas_object(df, index=True).values
+        st.session_state.df_hash = hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+        st.session_state.df_hash_key = upload_key
+    return st.session_state.df_hash
+
+def normalize_question(question):
+    """Collapse case and whitespace so trivially different phrasings share a cache entry"""
+    return " ".join(question.lower().split())
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_llm(api_key):
+    """Build the PandasAI OpenAI LLM once per API key (keeps its HTTP pool warm)"""
+    from llm_client import StreamingOpenAI
+    return StreamingOpenAI(api_token=api_key)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def describe_columns(df_hash, _df):
+    """Column-type summary for the LLM prompt, worked out once per dataset"""
+    numeric, categorical = split_columns(df_hash, _df)
+    parts = []
+    if len(numeric) > 0:
+        parts.append("Numeric columns: " + ", ".join(map(str, numeric)))
+    if len(categorical) > 0:
+        parts.append("Categorical columns: " + ", ".join(map(str, categorical)))
+    return ". ".join(parts) or None
+
+def build_smart_df(df, llm, description=None):
+    """Wrap df for PandasAI with a fixed sample head so every prompt shares one prefix"""
+    from pandasai import SmartDataframe
+    # PandasAI otherwise samples rows per prompt, which defeats OpenAI's prefix cache
+    return SmartDataframe(
+        df,
+        description=description,
+        custom_head=df.head(PROMPT_SAMPLE_ROWS),
+        config={
+            "llm": llm,
+            "enable_cache": True,
+            # Charts are shown in the page, not in an image viewer on the server
+            "open_charts": False,
+            # A file per chat; by default every chart overwrites one shared temp_chart.png
+            "save_charts": True,
+            "save_charts_path": CHARTS_DIR,
+            # Skip appending every prompt and generated snippet to pandasai.log
+            "save_logs": False,
+            "verbose": False
+        }
+    )
+
+def read_chart(response):
+    """Swap a chart file path returned by PandasAI for the image bytes"""
+    if isinstance(response, str) and response.endswith(".png") and os.path.isfile(response):
+        with open(response, "rb") as chart_file:
+            chart = chart_file.read()
+        os.remove(response)  # each chart file belongs to a single answer
+        return chart
+    return response
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def cached_chat(df_hash, question_norm, _new_smart_df):
+    """Answer a question, reusing earlier answers for the same dataset"""
+    # A fresh agent per miss: agents remember earlier chats, which would leak into this answer
+    response = _new_smart_df().chat(question_norm)
+    if isinstance(response, str) and response.startswith(PANDASAI_FAILURE_PREFIX):
+        # PandasAI reports failures as text; raise so they are not memoized
+        raise RuntimeError(response)
+    return read_chart(response)
+
+def llm_unavailable_notice():
+    """Warn and return True while the LLM circuit breaker is open"""
+    wait = breaker.retry_in()
+    if wait > 0:
+        st.warning(f"⏳ LLM temporarily unavailable, retry in {wait:.0f}s")
+        return True
+    return False
+
+def analyze_with_pandasai(df, df_hash, question, api_key):
     """Analyze data using PandasAI"""
     try:
-        from pandasai import SmartDataframe
-        from pandasai.llm import OpenAI
-        
-        llm = OpenAI(api_token=api_key)
-        smart_df = SmartDataframe(df, config={"llm": llm, "enable_cache": False})
-        response = smart_df.chat(question)
+        llm = get_llm(api_key)
+        description = describe_columns(df_hash, df)
+        response = cached_chat(
+            df_hash, normalize_question(question), lambda: build_smart_df(df, llm, description)
+        )
         return response
     except ImportError:
         return "Error: pandasai is not installed. Please install it using: pip install pandasai"
     except Exception as e:
         return f"Error: {str(e)}"
 
+def _chat_in_thread(df, df_hash, llm, description, question, ctx):
+    """Answer one question in a worker thread, through the shared answer cache"""
+    # Worker threads need the session's context to use the answer cache
+    add_script_run_ctx(threading.current_thread(), ctx)
+    return cached_chat(
+        df_hash, normalize_question(question), lambda: build_smart_df(df, llm, description)
+    )
+
+def run_questions_concurrently(df, df_hash, api_key, questions, on_result):
+    """Ask several independent questions at once, reporting each answer as it arrives"""
+    try:
+        llm = get_llm(api_key)
+    except ImportError:
+        error = "Error: pandasai is not installed. Please install it using: pip install pandasai"
+        for i in range(len(questions)):
+            on_result(i, error)
+        return
+    description = describe_columns(df_hash, df)
+    ctx = get_script_run_ctx()
+
+    async def ask(i, question):
+        try:
+            response = await asyncio.to_thread(_chat_in_thread, df, df_hash, llm, description, question, ctx)
+        except Exception as e:
+            response = f"Error: {str(e)}"
+        return i, response
+
+    async def run_all():
+        for next_done in asyncio.as_completed([ask(i, q) for i, q in enumerate(questions)]):
+            i, response = await next_done
+            on_result(i, response)
+
+    asyncio.run(run_all())
+
+def stream_analysis(df, df_hash, question, api_key):
+    """Run the analysis in a worker thread, streaming the LLM's generated code to the page"""
+    tokens = queue.Queue()
+    result = {}
+    
+    def worker():
+        try:
+            from llm_client import token_sink
+        except ImportError:
+            token_sink = contextlib.nullcontext
+        try:
+            with token_sink(tokens.put):
+                result["response"] = analyze_with_pandasai(df, df_hash, question, api_key)
+        finally:
+            tokens.put(None)
+    
+    thread = threading.Thread(target=worker, daemon=True)
+    add_script_run_ctx(thread)
+    thread.start()
+    
+    live_code = st.empty()
+    with live_code.container():
+        streamed = st.write_stream(iter(tokens.get, None))
+    if not streamed:
+        # Cached answers arrive without any tokens, so drop the empty stream
+        live_code.empty()
+    thread.join()
+    return result.get("response")
+
+def display_analysis_response(response):
+    """Render a PandasAI response according to its type"""
+    if response is not None:
+        # Look the class up without importing matplotlib for answers that aren't figures
+        figure_type = getattr(sys.modules.get("matplotlib.figure"), "Figure", None)
+        if isinstance(response, (pd.DataFrame, pd.Series)):
+            st.markdown("**📋 Data Table:**")
+            st.dataframe(response, use_container_width=True, height=400)
+        elif isinstance(response, bytes):
+            st.markdown("**📈 Chart:**")
+            st.image(response, use_column_width=True)
+        elif figure_type is not None and isinstance(response, figure_type):
+            st.markdown("**📈 Chart:**")
+            st.pyplot(response)
+        elif isinstance(response, (int, float)):
+            st.metric("🎯 Result", f"{response:,.2f}")
+        elif isinstance(response, str) and response.startswith("Error:"):
+            st.error(f"**Analysis Error:** {response}")
+        else:
+            st.markdown("**📝 Analysis Output:**")
+            st.info(response)
+    else:
+        st.info("The analysis was completed but no specific output was returned.")
+
+def split_questions(text):
+    """One question per non-empty line, dropping repeats"""
+    questions = {}
+    for line in text.splitlines():
+        if line.strip():
+            questions.setdefault(normalize_question(line), line.strip())
+    return list(questions.values())
+
+def display_batch_analysis(df, df_hash, questions, api_key):
+    """Answer several pasted questions concurrently, filling each expander as it completes"""
+    st.markdown("### 📊 Analysis Results")
+    slots = [st.empty() for _ in questions]
+    for slot, question in zip(slots, questions):
+        slot.caption(f"⏳ {question}")
+    
+    def show(i, response):
+        with slots[i].container():
+            with st.expander(questions[i], expanded=True):
+                display_analysis_response(response)
+    
+    run_questions_concurrently(df, df_hash, api_key, questions, show)
+
+@st.fragment
+def display_quick_analysis(df, df_hash, api_key):
+    """Canned questions picked from one form; runs as a fragment so a submit skips the rest of the page"""
+    st.markdown("### ⚡ Quick Analysis")
+    
+    # Choosing an action inside the form doesn't rerun the app; only the submit buttons do
+    with st.form("quick_analysis", border=False):
+        choice = st.selectbox(
+            "Quick analysis",
+            range(len(QUICK_ACTIONS)),
+            format_func=lambda i: QUICK_ACTIONS[i][0],
+            label_visibility="collapsed"
+        )
+        col1, col2 = st.columns(2)
+        run_one = col1.form_submit_button("▶️ Run", use_container_width=True)
+        run_all = col2.form_submit_button("🚀 Run All Quick", use_container_width=True)
+    
+    if not (run_one or run_all) or llm_unavailable_notice():
+        return
+    
+    if run_all:
+        slots = [col.empty() for col in st.columns(len(QUICK_ACTIONS))]
+        
+        def show(i, response):
+            with slots[i].container():
+                st.markdown(f"**{QUICK_ACTIONS[i][0]}**")
+                display_analysis_response(response)
+        
+        with st.spinner("🔍 Running all quick analyses..."):
+            run_questions_concurrently(df, df_hash, api_key, [q for _, q in QUICK_ACTIONS], show)
+    else:
+        label, question = QUICK_ACTIONS[choice]
+        with st.spinner(f"🔍 Running {label}..."):
+            response = analyze_with_pandasai(df, df_hash, question, api_key)
+        st.markdown(f"**{label}**")
+        display_analysis_response(response)
+
+@st.fragment
+def qa_panel(df, df_hash, api_key):
+    """Question box and answers; reruns on its own so a click skips the rest of the page"""
+    st.markdown("### 💬 Ask Anything About Your Data")
+    
+    # Enhanced chat interface; the form sends the question only when Analyze is pressed
+    with st.form("qa_form", border=False):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            user_question = st.text_area(
+                "Enter your question:",
+                placeholder="e.g., 'What is the correlation between age and salary?', 'Show me a bar chart of sales by product', 'What are the top 5 performing regions?' (one question per line to ask several at once)",
+                height=120,
+                label_visibility="collapsed"
+            )
+        
+        with col2:
+            st.write("")  # Spacer
+            st.write("")  # Spacer
+            analyze_btn = st.form_submit_button("🚀 Analyze", use_container_width=True)
+    
+    questions = split_questions(user_question) if user_question else []
+    if analyze_btn and len(questions) > 1:
+        if not llm_unavailable_notice():
+            with st.spinner(f"🔍 Analyzing {len(questions)} questions in parallel..."):
+                display_batch_analysis(df, df_hash, questions, api_key)
+    elif analyze_btn and questions:
+        if not llm_unavailable_notice():
+            with st.spinner("🔍 Analyzing your data with AI... This may take a few moments."):
+                try:
+                    # A repeat click on the same question re-shows the answer without a worker thread
+                    answer_key = (df_hash, normalize_question(user_question))
+                    if st.session_state.get("last_q") == answer_key:
+                        response = st.session_state.last_resp
+                    else:
+                        response = stream_analysis(df, df_hash, user_question, api_key)
+                        if not (isinstance(response, str) and response.startswith("Error:")):
+                            st.session_state.last_q = answer_key
+                            st.session_state.last_resp = response
+                
+                    st.markdown("### 📊 Analysis Results")
+                    display_analysis_response(response)
+                    
+                except Exception as e:
+                    st.error(f"An unexpected error occurred: {str(e)}")
+    elif analyze_btn:
+        st.warning("Please enter a question to analyze.")
+
 def main():
+    # Only the short @import is re-sent each run (an element left out of a rerun is cleared)
+    st.html(CUSTOM_CSS)
+    
     api_key = get_openai_api_key()
 
     # Header with gradient
@@ -436,107 +973,45 @@ def main():
             type=['csv', 'xlsx', 'xls'],
             help="Supported formats: CSV, Excel (.xlsx, .xls)"
         )
+        sheet = choose_excel_sheet(uploaded_file) if uploaded_file is not None else None
         
         st.markdown("### 💡 Example Questions")
-        st.markdown("""
-        <div style="background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px; border-left: 4px solid #667eea;">
-        <b style="color: #a8d8ea;">📈 For Sales Data:</b><br>
-        <span style="color: #e6e6e6;">• "Show monthly sales trends"</span><br>
-        <span style="color: #e6e6e6;">• "Top 5 products by revenue"</span><br>
-        <span style="color: #e6e6e6;">• "Sales by region pie chart"</span><br><br>
-        
-        <b style="color: #a8d8ea;">👥 For HR Data:</b><br>
-        <span style="color: #e6e6e6;">• "Average salary by department"</span><br>
-        <span style="color: #e6e6e6;">• "Employee age distribution"</span><br>
-        <span style="color: #e6e6e6;">• "Department headcount bar chart"</span><br><br>
-        
-        <b style="color: #a8d8ea;">🔧 General Analysis:</b><br>
-        <span style="color: #e6e6e6;">• "Show basic statistics"</span><br>
-        <span style="color: #e6e6e6;">• "Find missing values"</span><br>
-        <span style="color: #e6e6e6;">• "Correlation heatmap"</span>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(EXAMPLE_QUESTIONS_HTML, unsafe_allow_html=True)
         
         st.markdown("---")
         st.markdown("### 🛠️ Features")
-        features = [
-            ("📊", "Smart Data Profiling", "Automatic data quality assessment"),
-            ("🤖", "AI-Powered Analysis", "Natural language queries"),
-            ("📈", "Auto Visualizations", "Instant charts and graphs"),
-            ("⚡", "Real-time Processing", "Fast analysis results")
-        ]
-        
-        for emoji, title, desc in features:
-            st.markdown(f"""
-            <div style="margin: 10px 0; padding: 10px; background: rgba(255,255,255,0.1); border-radius: 8px;">
-                <strong style="color: #a8d8ea;">{emoji} {title}</strong><br>
-                <small style="color: #e6e6e6;">{desc}</small>
-            </div>
-            """, unsafe_allow_html=True)
+        st.markdown(FEATURES_HTML, unsafe_allow_html=True)
 
     # Main content area
     if uploaded_file is not None:
         # Load and display data
-        df = load_data(uploaded_file)
+        df = load_data(uploaded_file, sheet)
         if df is not None:
-            display_data_overview(df)
+            df_hash = get_df_hash(df, uploaded_file, sheet)
+            display_data_overview(df, df_hash)
             
             # Quick visualizations
-            create_quick_visualizations(df)
+            numeric_cols, categorical_cols = split_columns(df_hash, df)
+            create_quick_visualizations(df, df_hash, numeric_cols, categorical_cols)
             
-            if api_key:
+            if not PANDASAI_AVAILABLE:
+                st.info("🤖 AI-powered analysis needs PandasAI. Install it with: pip install pandasai")
+            elif api_key:
                 st.markdown("---")
-                st.markdown("### 💬 Ask Anything About Your Data")
-                
-                # Enhanced chat interface
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    user_question = st.text_area(
-                        "Enter your question:",
-                        placeholder="e.g., 'What is the correlation between age and salary?', 'Show me a bar chart of sales by product', 'What are the top 5 performing regions?'",
-                        height=120,
-                        label_visibility="collapsed"
-                    )
+                qa_panel(df, df_hash, api_key)
                 
-                with col2:
-                    st.write("")  # Spacer
-                    st.write("")  # Spacer
-                    analyze_btn = st.button("🚀 Analyze", use_container_width=True)
-                
-                if analyze_btn and user_question:
-                    with st.spinner("🔍 Analyzing your data with AI... This may take a few moments."):
-                        try:
-                            response = analyze_with_pandasai(df, user_question, api_key)
-                            
-                            st.markdown("### 📊 Analysis Results")
-                            
-                            if response is not None:
-                                if isinstance(response, (pd.DataFrame, pd.Series)):
-                                    st.markdown("**📋 Data Table:**")
-                                    st.dataframe(response, use_container_width=True, height=400)
-                                elif isinstance(response, (int, float)):
-                                    st.markdown(f'''
-                                    <div class="success-card">
-                                        <h3>🎯 Result:</h3>
-                                        <h1 style="text-align: center; margin: 20px 0; font-size: 3rem;">{response:,.2f}</h1>
-                                    </div>
-                                    ''', unsafe_allow_html=True)
-                                elif isinstance(response, str) and response.startswith("Error:"):
-                                    st.error(f"**Analysis Error:** {response}")
-                                else:
-                                    st.markdown("**📝 Analysis Output:**")
-                                    st.info(response)
-                            else:
-                                st.info("The analysis was completed but no specific output was returned.")
-                                
-                        except Exception as e:
-                            st.error(f"An unexpected error occurred: {str(e)}")
-                elif analyze_btn and not user_question:
-                    st.warning("Please enter a question to analyze.")
+                st.markdown("---")
+                display_quick_analysis(df, df_hash, api_key)
             else:
                 st.warning("🔑 Please enter your OpenAI API key in the sidebar to enable AI-powered analysis.")
     
     else:
+        # Drop the parsed frames of a removed upload, including a background load
+        if "full_load" in st.session_state:
+            st.session_state.full_load.cancel()
+        for key in ("data_id", "data_df", "full_load", "full_load_id", "full_load_preview", "sheet_names_id", "sheet_names"):
+            st.session_state.pop(key, None)
+        
         # Enhanced welcome screen
         st.markdown("""
         <div class="info-card">
@@ -579,25 +1054,11 @@ def main():
         
         with col1:
             st.markdown("#### 💼 Sales Data Example")
-            sample_sales = pd.DataFrame({
-                'Date': ['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-02', '2024-01-03'],
-                'Product': ['Laptop', 'Mouse', 'Laptop', 'Keyboard', 'Monitor'],
-                'Sales': [15000, 8000, 16000, 4500, 22000],
-                'Region': ['North', 'South', 'North', 'East', 'West'],
-                'Units': [15, 80, 16, 45, 22]
-            })
-            st.dataframe(sample_sales, use_container_width=True)
+            st.dataframe(SAMPLE_SALES, use_container_width=True, hide_index=True)
             
         with col2:
             st.markdown("#### 👥 Employee Data Example")
-            sample_employees = pd.DataFrame({
-                'Name': ['John Smith', 'Sarah Johnson', 'Mike Brown', 'Emily Davis', 'David Wilson'],
-                'Department': ['Engineering', 'Marketing', 'Engineering', 'Sales', 'HR'],
-                'Salary': [85000, 65000, 95000, 75000, 60000],
-                'Age': [32, 28, 35, 29, 41],
-                'Experience': [5, 3, 8, 4, 12]
-            })
-            st.dataframe(sample_employees, use_container_width=True)
+            st.dataframe(SAMPLE_EMPLOYEES, use_container_width=True, hide_index=True)
 
 if __name__ == "__main__":
     main()
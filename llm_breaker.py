@@ -0,0 +1,65 @@
+"""
+Circuit breaker that lets DataSense fail fast while the LLM endpoint is degraded
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"        # calls flow normally
+    OPEN = "open"            # calls are rejected until the cooldown ends
+    HALF_OPEN = "half_open"  # one probe call decides whether to close again
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the circuit is open"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"LLM temporarily unavailable, retry in {max(retry_in, 1):.0f}s")
+        self.retry_in = retry_in
+
+
+@dataclass
+class CircuitBreaker:
+    failure_threshold: int = 3
+    recovery_timeout: float = 60.0
+    state: CircuitState = CircuitState.CLOSED
+    failures: int = 0
+    opened_at: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def retry_in(self):
+        """Seconds until calls are let through again (0 when not open)"""
+        with self._lock:
+            if self.state is not CircuitState.OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def can_proceed(self):
+        """Whether a call may go ahead; after the cooldown the first caller becomes the probe"""
+        with self._lock:
+            if self.state is CircuitState.CLOSED:
+                return True
+            if self.state is CircuitState.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = CircuitState.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CircuitState.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state is CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+
+
+# Shared by every session: an OpenAI outage affects all of them alike
+breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
@@ -0,0 +1,112 @@
+"""
+PandasAI LLM wrapper for DataSense that can stream tokens while a chat runs
+"""
+
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from llm_breaker import CircuitOpenError, breaker
+from openai import APIConnectionError, APIStatusError, RateLimitError
+from pandasai.llm import OpenAI
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+# Per-thread callback that receives streamed tokens (None = don't stream)
+_sink = threading.local()
+
+# Cap on in-flight OpenAI requests across every session and worker thread
+MAX_CONCURRENT_CALLS = 5
+_call_slots = threading.BoundedSemaphore(MAX_CONCURRENT_CALLS)
+
+_backoff = wait_exponential(multiplier=1, min=2, max=60)
+
+
+@contextmanager
+def token_sink(callback):
+    """Stream every LLM token generated on this thread to `callback`"""
+    _sink.callback = callback
+    try:
+        yield
+    finally:
+        _sink.callback = None
+
+
+def _is_retryable(exc):
+    """Retry rate limits, dropped connections and server-side errors only"""
+    if isinstance(exc, RateLimitError):
+        # An exhausted quota is a 429 too, but it belongs to one key and won't clear by waiting
+        return getattr(exc, "code", None) != "insufficient_quota"
+    if isinstance(exc, APIConnectionError):
+        return True
+    return isinstance(exc, APIStatusError) and exc.status_code >= 500
+
+
+def _wait_before_retry(retry_state):
+    """Honour the Retry-After header on 429s, otherwise back off exponentially"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RateLimitError):
+        try:
+            return min(float(exc.response.headers.get("retry-after")), 60)
+        except (TypeError, ValueError):
+            pass
+    return _backoff(retry_state)
+
+
+class _StreamingCompletions:
+    """Proxy for the OpenAI chat completions client that streams to the active sink"""
+
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, **params):
+        callback = getattr(_sink, "callback", None)
+        if callback is None:
+            return self._completions.create(**params)
+
+        parts = []
+        for chunk in self._completions.create(**params, stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                token = chunk.choices[0].delta.content
+                parts.append(token)
+                callback(token)
+
+        # PandasAI only reads choices[0].message.content from the response
+        message = SimpleNamespace(content="".join(parts))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class StreamingOpenAI(OpenAI):
+    """PandasAI OpenAI LLM that streams inside `token_sink` and retries transient failures"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if getattr(self, "_is_chat_model", False):
+            self.client = _StreamingCompletions(self.client)
+
+    def call(self, instruction, context=None):
+        if not breaker.can_proceed():
+            raise CircuitOpenError(breaker.retry_in())
+        try:
+            response = self._call_with_retry(instruction, context)
+        except Exception as e:
+            # Only outages count against the breaker; a 4xx proves the endpoint is up
+            if _is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return response
+
+    @retry(
+        retry=retry_if_exception(_is_retryable),
+        wait=_wait_before_retry,
+        stop=stop_after_attempt(4),
+        reraise=True,
+    )
+    def _call_with_retry(self, instruction, context):
+        with _call_slots:
+            return super().call(instruction, context)